@@ -12,10 +12,39 @@ Site: https://pyga.me
 # IMPORTS 
 import pygame
 import random
+import heapq
 
 # PYGAME SETUP
 pygame.init()
-screen       = pygame.display.set_mode((1088,544),pygame.SCALED)
+# WIDTH AND HEIGHT OF THE GAME IN PIXELS
+GAMEWIDTH    = 1088
+GAMEHEIGHT   = 544
+# WHEN TRUE, THE WINDOW IS OPENED AT THE LARGEST WHOLE
+# NUMBER MULTIPLE OF THE GAME SIZE THAT FITS THE DISPLAY
+# AND IMAGES ARE SCALED ONCE WHEN LOADED. WHEN FALSE, 
+# pygame.SCALED RESCALES THE WHOLE FRAME EVERY FRAME
+PRESCALE     = True
+# DISPLAY THE WINDOW OPENS ON
+DISPLAY      = 0
+# SPACE LEFT ON THE DISPLAY FOR THE TASKBAR AND TITLE BAR,
+# SINCE pygame CANNOT REPORT THE USABLE AREA OF A DISPLAY
+DISPLAYMARGIN = 100
+desktopWidth,desktopHeight = pygame.display.get_desktop_sizes()[DISPLAY]
+fullScale    = max(1,min(desktopWidth//GAMEWIDTH,desktopHeight//GAMEHEIGHT))
+DRAWSCALE    = max(1,min(desktopWidth//GAMEWIDTH,
+                         (desktopHeight-DISPLAYMARGIN)//GAMEHEIGHT))
+# IF THE MARGIN CHANGES THE SCALE, THE WINDOW WOULD FILL THE
+# DISPLAY TOO CLOSELY TO GUESS, SO LEAVE IT TO pygame.SCALED
+# WHICH KNOWS THE USABLE AREA. NOTE THAT THIS QUIETLY TURNS
+# PRESCALING OFF ON DISPLAYS THAT ARE AN EXACT OR NEAR EXACT
+# MULTIPLE OF THE GAME SIZE, SUCH AS 2176x1088
+if PRESCALE and DRAWSCALE == fullScale:
+    screen       = pygame.display.set_mode((GAMEWIDTH*DRAWSCALE,GAMEHEIGHT*DRAWSCALE),
+                                           display=DISPLAY)
+else:
+    DRAWSCALE    = 1
+    screen       = pygame.display.set_mode((GAMEWIDTH,GAMEHEIGHT),pygame.SCALED,
+                                           display=DISPLAY)
 pygame.display.set_caption("Warehouse Escape")
 clock        = pygame.time.Clock()
 running      = True
@@ -23,17 +52,18 @@ running      = True
 # GAME CONSTANTS
 # XY SCALE
 IMGSCALE    :int      = 32 
+# SIZE OF A TILE ON THE SCREEN
+TILESIZE    :int      = IMGSCALE*DRAWSCALE
 # DELAYS ON PLAYER, DROPPER MOVEMENT
 # AND GRAVITY
 PLAYERDELAY :float    = 0.00 
 DROPPERDELAY:float    = 0.00 
 GRAVDELAY   :float    = 0.00
 # WIDTH AND LENGTH OF WINDOW
-X           :int      = screen.get_width()
-Y           :int      = screen.get_height()
+X           :int      = screen.get_width()//DRAWSCALE
+Y           :int      = screen.get_height()//DRAWSCALE
 # GAME VARIABLES
-levelNumber:int  = 11 # INITIALISE LEVEL NUMBER
-turnNumber :int  = 0 # INITIALISE TURN NUMBER
+STARTLEVEL  :int      = 11 # INITIALISE LEVEL NUMBER
 
 # LOAD IMAGES
 # USED ASSERT STATEMENT TO PREVENT BAD IMAGE SIZES
@@ -86,6 +116,369 @@ except AssertionError:
     print("Error loading images...quitting")
     exit(0)
 
+# PRE-SCALED IMAGES
+# MAPS EACH IMAGE TO A COPY SCALED BY DRAWSCALE, SO 
+# NOTHING IS SCALED WHILE DRAWING
+scaled:dict = {image: image if DRAWSCALE == 1 
+               else pygame.transform.scale_by(image,DRAWSCALE)
+               for image in (background,floor,wall,ceiling,box,itembox,door,
+                             entryPortal,exitPortal,item,p,d)}
+
+# ZOBRIST HASHING
+# EVERY TILE IN EVERY CELL, EVERY PLAYER AND DROPPER POSITION
+# AND EVERY SCALAR VALUE GETS ITS OWN RANDOM LOOKING 64 BIT
+# KEY. THE HASH OF A GAME STATE IS THE XOR OF THE KEYS THAT
+# DESCRIBE IT, SO A CHANGE ONLY NEEDS THE OLD AND NEW KEYS
+MASK64:int = 0xFFFFFFFFFFFFFFFF
+
+def zobristKey(kind:int,index:int) -> int:
+    """
+    Function used to make the key for one thing that can be
+    hashed. The keys are worked out with splitmix64 rather than
+    drawn from random, so they are the same on every run and
+    do not depend on the seeds used by generateRoom.
+
+    Parameters:
+        kind (int): What is being hashed, e.g. a tile or the energy.
+
+        index (int): Which cell or value of that kind.
+
+    Returns:
+        key (int): A 64 bit key.
+    """
+
+    n = ((kind << 32) + index + 0x9E3779B97F4A7C15) & MASK64
+    n = ((n ^ (n >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    n = ((n ^ (n >> 27)) * 0x94D049BB133111EB) & MASK64
+    return n ^ (n >> 31)
+
+# KINDS OF KEYS THAT ARE NOT TILES
+ZOBRISTPLAYER :int = 16
+ZOBRISTDROPPER:int = 17
+ZOBRISTENERGY :int = 18
+ZOBRISTPOINTS :int = 19
+ZOBRISTFLAGS  :int = 20
+# KEYS FOR THE PORTAL FLAGS AND FOR AN ODD TURN NUMBER
+ENTRYPORTALKEY:int = zobristKey(ZOBRISTFLAGS,0)
+EXITPORTALKEY :int = zobristKey(ZOBRISTFLAGS,1)
+TURNPARITYKEY :int = zobristKey(ZOBRISTFLAGS,2)
+
+# KEYS FOR EACH TILE IN EACH CELL, LAID OUT LIKE THE TILEMAP.
+# EMPTY CELLS HAVE A KEY OF 0
+tileKeys:dict = {tile: [[zobristKey(kind,x*(Y//IMGSCALE)+y) for y in range(Y//IMGSCALE)]
+                        for x in range(X//IMGSCALE+1)]
+                 for kind,tile in enumerate((background,floor,wall,ceiling,box,itembox,
+                                             door,entryPortal,exitPortal,item))}
+tileKeys[None] = [[0 for _ in range(Y//IMGSCALE)] for _ in range(X//IMGSCALE+1)]
+
+# KEYS FOR THE PLAYER AND DROPPER BEING IN EACH CELL
+playerKeys:list  = [[zobristKey(ZOBRISTPLAYER,x*(Y//IMGSCALE)+y) for y in range(Y//IMGSCALE)]
+                    for x in range(X//IMGSCALE+1)]
+dropperKeys:list = [[zobristKey(ZOBRISTDROPPER,x*(Y//IMGSCALE)+y) for y in range(Y//IMGSCALE)]
+                    for x in range(X//IMGSCALE+1)]
+
+# SURFACE HEIGHT MAP
+class SurfaceMap:
+    """
+    Class used to index, for every column of the grid, where
+    the topmost surface is, which floor tiles have free space
+    above them and which boxes will fall on the next turn. The
+    index is updated from each tile that changes, so where an
+    exit portal can go and which boxes need to move can be
+    answered without scanning the grid.
+
+    Attributes:
+        height (int): The number of tiles in a column.
+
+        tops (list): For each column, the vertical position of
+        the first tile below the ceiling that is not a background
+        tile. Every tile between the ceiling and this one is free.
+
+        floors (list): For each column, a set of the vertical
+        positions of floor tiles with a background tile directly
+        above them.
+
+        falling (list): For each column, a set of the vertical
+        positions of boxes that applyBoxGravity will move or
+        remove, i.e. a box above a background tile or an item,
+        or an itembox above a background tile.
+    """
+
+    def __init__(self,width:int,height:int):
+        """
+        The constructor method for class SurfaceMap.
+
+        Parameters:
+            width (int): The number of columns in the grid.
+
+            height (int): The number of tiles in a column.
+        """
+
+        self.height  = height
+        self.tops    = [height for _ in range(width)]
+        self.floors  = [set() for _ in range(width)]
+        self.falling = [set() for _ in range(width)]
+
+    def isFloor(self,column:list,y:int) -> bool:
+        """
+        A method used to check whether a tile is a floor
+        tile with a background tile directly above it.
+
+        Parameters:
+            column (list): The column of the level the tile is in.
+
+            y (int): The vertical position of the tile.
+
+        Returns:
+            isFloor (bool): Whether the tile is a free floor tile.
+        """
+
+        return 1 <= y < self.height and column[y] == floor and column[y-1] == background
+
+    def isFalling(self,column:list,y:int) -> bool:
+        """
+        A method used to check whether a tile is a box
+        that applyBoxGravity will move or remove.
+
+        Parameters:
+            column (list): The column of the level the tile is in.
+
+            y (int): The vertical position of the tile.
+
+        Returns:
+            isFalling (bool): Whether the tile is a falling box.
+        """
+
+        if not 1 <= y < self.height-1:
+            return False
+
+        return ((column[y] == box and (column[y+1] == background or column[y+1] == item))
+                or (column[y] == itembox and column[y+1] == background))
+
+    def updateTile(self,room:list,x:int,y:int) -> None:
+        """
+        A method used to update the index after a single
+        tile has changed. Only the tile and its neighbours
+        above and below are looked at, unless the topmost
+        surface of the column was removed, in which case the
+        free tiles below it are walked to find the next one.
+
+        Parameters:
+            room (list): A 2D list representing the level,
+            with the new tile already in place.
+
+            x (int): Horizontal position of the tile.
+
+            y (int): Vertical position of the tile.
+        """
+
+        column = room[x]
+
+        if column[y] != background:
+            if 1 <= y < self.tops[x]:
+                self.tops[x] = y
+        elif y == self.tops[x]:
+            top = y+1
+            while top < self.height and column[top] == background:
+                top += 1
+            self.tops[x] = top
+
+        for tileY in (y,y+1):
+            if self.isFloor(column,tileY):
+                self.floors[x].add(tileY)
+            else:
+                self.floors[x].discard(tileY)
+
+        for tileY in (y-1,y):
+            if self.isFalling(column,tileY):
+                self.falling[x].add(tileY)
+            else:
+                self.falling[x].discard(tileY)
+
+    def updateColumn(self,room:list,x:int) -> None:
+        """
+        A method used to work out the index for a whole
+        column from scratch.
+
+        Parameters:
+            room (list): A 2D list representing the level.
+
+            x (int): The column to work out.
+        """
+
+        column = room[x]
+
+        self.tops[x] = self.height
+        for y in range(1,self.height):
+            if column[y] != background:
+                self.tops[x] = y
+                break
+
+        self.floors[x]  = {y for y in range(self.height) if self.isFloor(column,y)}
+        self.falling[x] = {y for y in range(self.height) if self.isFalling(column,y)}
+
+    def copy(self):
+        """
+        A method used to make a copy of the index. Only the
+        outer lists are copied, so the sets for each column
+        are shared until copyColumn is called for them.
+
+        Returns:
+            surfaces (SurfaceMap): The copied index.
+        """
+
+        new = SurfaceMap.__new__(SurfaceMap)
+        new.height  = self.height
+        new.tops    = list(self.tops)
+        new.floors  = list(self.floors)
+        new.falling = list(self.falling)
+
+        return new
+
+    def copyColumn(self,x:int) -> None:
+        """
+        A method used to give a column its own sets, so that
+        they can be changed without changing a copy of the index.
+
+        Parameters:
+            x (int): The column to copy.
+        """
+
+        self.floors[x]  = set(self.floors[x])
+        self.falling[x] = set(self.falling[x])
+
+    def rebuild(self,room:list) -> None:
+        """
+        A method used to work out the index for every
+        column, used when the whole level is generated.
+
+        Parameters:
+            room (list): A 2D list representing the level.
+        """
+
+        for x in range(len(room)):
+            self.updateColumn(room,x)
+
+    def getTop(self,x:int) -> int:
+        """
+        A method used to retrieve the topmost surface
+        of a column.
+
+        Parameters:
+            x (int): The column to look at.
+
+        Returns:
+            top (int): The vertical position of the first
+            tile below the ceiling that is not a background tile.
+        """
+
+        return self.tops[x]
+
+    def getFloors(self,x:int) -> list:
+        """
+        A method used to retrieve the floor tiles in a
+        column that have a free tile directly above them.
+
+        Parameters:
+            x (int): The column to look at.
+
+        Returns:
+            floors (list): The vertical positions of the floor
+            tiles, ordered from the bottom up.
+        """
+
+        return sorted(self.floors[x],reverse=True)
+
+    def getFalling(self) -> list:
+        """
+        A method used to retrieve the columns that have
+        boxes which will fall on the next turn.
+
+        Returns:
+            falling (list): A list of (x, y) pairs, one for
+            each column with falling boxes, where y is the
+            vertical position of the lowest falling box.
+        """
+
+        return [(x,max(falling)) for x,falling in enumerate(self.falling) if falling]
+
+# BLIT SEQUENCE
+class BlitSequence:
+    """
+    Class used to hold a reusable list of (tile, position) pairs
+    for every tile drawn on the grid, so that the whole level can
+    be drawn with a single call to screen.fblits. The positions
+    are worked out once, and only the pairs of tiles that change
+    are replaced. Tiles are swapped for their pre-scaled copies.
+
+    Attributes:
+        width (int): The number of columns drawn.
+
+        height (int): The number of tiles in a column.
+
+        positions (list): The on screen position of every tile,
+        in the same order as sequence.
+
+        sequence (list): The (tile, position) pairs passed to
+        screen.fblits.
+    """
+
+    def __init__(self,width:int,height:int):
+        """
+        The constructor method for class BlitSequence.
+
+        Parameters:
+            width (int): The number of columns drawn.
+
+            height (int): The number of tiles in a column.
+        """
+
+        self.width     = width
+        self.height    = height
+        self.positions = [(x*TILESIZE,y*TILESIZE) 
+                          for x in range(width) for y in range(height)]
+        self.sequence  = []
+
+    def updateTile(self,x:int,y:int,tile:pygame.Surface) -> None:
+        """
+        A method used to replace the pair for a single tile.
+        Tiles outside of the drawn columns are ignored.
+
+        Parameters:
+            x (int): Horizontal position of the tile.
+
+            y (int): Vertical position of the tile.
+
+            tile (pygame.Surface): The new tile.
+        """
+
+        if x < self.width and self.sequence:
+            i = x*self.height+y
+            self.sequence[i] = (scaled[tile],self.positions[i])
+
+    def rebuild(self,room:list) -> None:
+        """
+        A method used to rebuild every pair, used when
+        the whole level is generated.
+
+        Parameters:
+            room (list): A 2D list representing the level.
+        """
+
+        self.sequence = [(scaled[room[x][y]],self.positions[x*self.height+y])
+                         for x in range(self.width) for y in range(self.height)]
+
+    def getSequence(self) -> list:
+        """
+        A method used to retrieve the pairs to draw.
+
+        Returns:
+            sequence (list): The (tile, position) pairs for
+            every tile drawn on the grid.
+        """
+
+        return self.sequence
+
 # PLAYER
 class Player:
     """
@@ -119,10 +512,17 @@ class Player:
 
         playerImage (pygame.Surface): Stores the Surface with the player
         image loaded.
+
+        state (GameState): The game state the player belongs to.
     """
 
-    def __init__(self):
-        """The constructor method for class Player."""
+    def __init__(self,state):
+        """
+        The constructor method for class Player.
+
+        Parameters:
+            state (GameState): The game state the player belongs to.
+        """
 
         self.cooldown          = 0.00
         self.gravCooldown      = 0.00
@@ -134,30 +534,70 @@ class Player:
         self.x                 = 1
         self.y                 = (Y-(2*IMGSCALE))//IMGSCALE
         self.playerImage       = p
+        self.state             = state
 
-    def decCooldown(self,n:float) -> None:
+    def fork(self,state):
         """
-        A method that decrements cooldown by a
-        float value 'n'.
+        A method used to make a copy of the player
+        for a forked game state.
 
         Parameters:
-            n (float): A float value used to decrement
-            gravCooldown.
-        """
+            state (GameState): The game state the copy belongs to.
 
-        self.cooldown -= n
+        Returns:
+            player (Player): The copied player.
+        """
 
-    def decGravCooldown(self,n:float) -> None:
+        new = Player.__new__(Player)
+        new.cooldown          = self.cooldown
+        new.gravCooldown      = self.gravCooldown
+        new.points            = self.points
+        new.maxEnergy         = self.maxEnergy
+        new.currentEnergy     = self.currentEnergy
+        new.entryPortalExists = self.entryPortalExists
+        new.exitPortalExists  = self.exitPortalExists
+        new.x                 = self.x
+        new.y                 = self.y
+        new.playerImage       = self.playerImage
+        new.state             = state
+
+        return new
+
+    def startCooldown(self) -> None:
+        """
+        A method that starts the movement cooldown
+        and registers its end with the scheduler. A
+        delay of 0 or less ends the cooldown straight
+        away, without a timer.
         """
-        A method that decrements gravCooldown by a
-        float value 'n'.
 
-        Parameters:
-            n (float): A float value used to decrement
-            gravCooldown.
+        self.cooldown = PLAYERDELAY
+        if PLAYERDELAY > 0:
+            self.state.scheduler.afterSeconds(PLAYERDELAY,
+                                              lambda state: state.player.endCooldown())
+
+    def endCooldown(self) -> None:
+        """A method used to end the movement cooldown."""
+
+        self.cooldown = 0.00
+
+    def startGravCooldown(self) -> None:
+        """
+        A method that starts the gravity cooldown
+        and registers its end with the scheduler. A
+        delay of 0 or less ends the cooldown straight
+        away, without a timer.
         """
 
-        self.gravCooldown -= n
+        self.gravCooldown = PLAYERDELAY
+        if PLAYERDELAY > 0:
+            self.state.scheduler.afterSeconds(PLAYERDELAY,
+                                              lambda state: state.player.endGravCooldown())
+
+    def endGravCooldown(self) -> None:
+        """A method used to end the gravity cooldown."""
+
+        self.gravCooldown = 0.00
 
     def incPoints(self) -> None:
         """
@@ -165,11 +605,15 @@ class Player:
         of points the player has by one.
         """
 
+        self.state.hash ^= (zobristKey(ZOBRISTPOINTS,self.points)
+                            ^ zobristKey(ZOBRISTPOINTS,self.points+1))
         self.points += 1
 
     def resetPoints(self) -> None:
         """"A method used to reset points."""
 
+        self.state.hash ^= (zobristKey(ZOBRISTPOINTS,self.points)
+                            ^ zobristKey(ZOBRISTPOINTS,0))
         self.points = 0
 
     def getPoints(self) -> int:
@@ -194,11 +638,17 @@ class Player:
             current energy by. Can be positive to increase 
             or negative to decrease.
         """
+
+        previousEnergy = self.currentEnergy
+
         if n <= self.maxEnergy and n >= 0:
             self.currentEnergy += n
         else:
             self.currentEnergy = 0
 
+        self.state.hash ^= (zobristKey(ZOBRISTENERGY,previousEnergy)
+                            ^ zobristKey(ZOBRISTENERGY,self.currentEnergy))
+
     def getEnergy(self) -> int:
         """
         A method used to retrieve the currentEnergy.
@@ -230,14 +680,14 @@ class Player:
 
         remainingEnergy = self.currentEnergy/self.maxEnergy
 
-        pygame.draw.rect(screen,"blue",(self.x*IMGSCALE,
-                                        self.y*IMGSCALE+29,
-                                        IMGSCALE,
-                                        3))
-        pygame.draw.rect(screen,"cyan",(self.x*IMGSCALE,
-                                        self.y*IMGSCALE+29,
-                                        IMGSCALE*remainingEnergy,
-                                        3))
+        pygame.draw.rect(screen,"blue",(self.x*TILESIZE,
+                                        self.y*TILESIZE+29*DRAWSCALE,
+                                        TILESIZE,
+                                        3*DRAWSCALE))
+        pygame.draw.rect(screen,"cyan",(self.x*TILESIZE,
+                                        self.y*TILESIZE+29*DRAWSCALE,
+                                        int(IMGSCALE*remainingEnergy)*DRAWSCALE,
+                                        3*DRAWSCALE))
 
     def makePortal(self,whichDirection:bool) -> None:
         """
@@ -261,21 +711,21 @@ class Player:
         """
 
         if not self.entryPortalExists:
-            room[self.x][self.y] = entryPortal
+            self.state.setTile(self.x,self.y,entryPortal)
             self.entryPortalExists = True
+            self.state.hash ^= ENTRYPORTALKEY
 
             if not self.exitPortalExists:
                 if whichDirection and self.x+10 < 33: 
-                    for y in range(Y//IMGSCALE-1,0,-1):
-                        if room[self.x+10][y] == floor and room[self.x+10][y-1] == background:
-                            room[self.x+10][y-1] = exitPortal
+                    for y in self.state.surfaces.getFloors(self.x+10):
+                        self.state.setTile(self.x+10,y-1,exitPortal)
 
                 elif not whichDirection and self.x-10 > 0:
-                    for y in range(Y//IMGSCALE-1,0,-1):
-                        if room[self.x-10][y] == floor and room[self.x-10][y-1] == background:
-                            room[self.x-10][y-1] = exitPortal
+                    for y in self.state.surfaces.getFloors(self.x-10):
+                        self.state.setTile(self.x-10,y-1,exitPortal)
 
                 self.exitPortalExists = True
+                self.state.hash ^= EXITPORTALKEY
 
     def findPortal(self,whichPortal:bool):
         """
@@ -291,16 +741,18 @@ class Player:
             (True), or an entryPortal (False).
         """
 
+        room = self.state.room
+
         if whichPortal:
             for x in range(0,X//IMGSCALE):
                 for y in range(Y//IMGSCALE-1,0,-1):
                     if room[x][y] == exitPortal:
-                        player.setPosition(x,y)
+                        self.setPosition(x,y)
         else:
             for x in range(0,X//IMGSCALE):
                 for y in range(Y//IMGSCALE-1,0,-1):
                     if room[x][y] == entryPortal:
-                        player.setPosition(x,y)
+                        self.setPosition(x,y)
 
     def clearPortals(self):
         """
@@ -309,6 +761,14 @@ class Player:
         down for instances of entryPortal or exitPortal
         and changes them to background tiles.
         """
+
+        room = self.state.room
+
+        if self.entryPortalExists:
+            self.state.hash ^= ENTRYPORTALKEY
+        if self.exitPortalExists:
+            self.state.hash ^= EXITPORTALKEY
+
         self.entryPortalExists = False
         self.exitPortalExists  = False
 
@@ -316,7 +776,7 @@ class Player:
             for y in range(Y//IMGSCALE):
                 if (room[x][y] == entryPortal 
                         or room[x][y] == exitPortal):
-                    room[x][y] = background
+                    self.state.setTile(x,y,background)
 
         
 
@@ -332,6 +792,7 @@ class Player:
 
         """
 
+        self.state.hash ^= playerKeys[self.x][self.y] ^ playerKeys[x][y]
         self.x = x
         self.y = y
 
@@ -363,10 +824,12 @@ class Player:
         move one tile up on to boxes.
         """
 
+        room = self.state.room
+
         if self.cooldown <= 0:
             if (room[self.x-1][self.y] == background):
                 self.setPosition(self.x-1,self.y)
-                self.cooldown = PLAYERDELAY
+                self.startCooldown()
 
             if (room[self.x-1][self.y] == entryPortal):
                 self.findPortal(True)
@@ -376,17 +839,17 @@ class Player:
 
             elif ((room[self.x-1][self.y] == box or room[self.x-1][self.y] == itembox) 
                     and room[self.x-1][self.y-1] == background):
-                player.setPosition(self.x-1,self.y-1)
+                self.setPosition(self.x-1,self.y-1)
 
             elif (room[self.x-1][self.y] == item):
                 self.incPoints()
-                room[self.x-1][self.y] = background
-                player.setPosition(self.x-1,self.y)
+                self.state.setTile(self.x-1,self.y,background)
+                self.setPosition(self.x-1,self.y)
 
             elif (room[self.x-1][self.y-1] == item):
                 self.incPoints()
-                room[self.x-1][self.y-1] = background
-                player.setPosition(self.x-1,self.y-1)
+                self.state.setTile(self.x-1,self.y-1,background)
+                self.setPosition(self.x-1,self.y-1)
 
             elif (room[self.x-1][self.y-1] == entryPortal):
                 self.findPortal(True)
@@ -402,11 +865,13 @@ class Player:
         move one tile up on to boxes.
         """
 
+        room = self.state.room
+
         if self.cooldown <= 0 and self.x < 34:
             if (room[self.x+1][self.y] == background 
                     or room[self.x+1][self.y] == door):
                 self.setPosition(self.x+1,self.y)
-                self.cooldown = PLAYERDELAY
+                self.startCooldown()
 
             elif (room[self.x+1][self.y] == entryPortal):
                 self.findPortal(True)
@@ -416,12 +881,12 @@ class Player:
 
             elif ((room[self.x+1][self.y] == box or room[self.x+1][self.y] == itembox) 
                   and room[self.x+1][self.y-1] == background):
-                player.setPosition(self.x+1,self.y-1)
+                self.setPosition(self.x+1,self.y-1)
 
             elif (room[self.x+1][self.y] == item):
                 self.incPoints()
-                room[self.x+1][self.y] = background
-                player.setPosition(self.x+1,self.y)
+                self.state.setTile(self.x+1,self.y,background)
+                self.setPosition(self.x+1,self.y)
 
             elif (room[self.x+1][self.y-1] == entryPortal):
                 self.findPortal(True)
@@ -435,12 +900,14 @@ class Player:
         A method used to add gravity to the player's
         movements.
         """
+
+        room = self.state.room
         
         if self.gravCooldown <= 0:
             if (room[self.x][self.y+1] == background 
                 or room[self.x][self.y+1] == item):
                 self.setPosition(self.x,self.y+1)
-                self.gravCooldown = PLAYERDELAY
+                self.startGravCooldown()
 
             elif (room[self.x][self.y+1] == entryPortal):
                 self.findPortal(True)
@@ -453,16 +920,19 @@ class Player:
         A method that allows the player to break adjacent
         boxes, checking on the left first.
         """
+
+        room = self.state.room
+
         if self.currentEnergy > 50:
             if room[self.x-1][self.y] == box:
-                room[self.x-1][self.y] = background
+                self.state.setTile(self.x-1,self.y,background)
             elif room[self.x-1][self.y] == itembox:
-                room[self.x-1][self.y] = item
+                self.state.setTile(self.x-1,self.y,item)
 
             if room[self.x+1][self.y] == box:
-                room[self.x+1][self.y] = background
+                self.state.setTile(self.x+1,self.y,background)
             elif room[self.x+1][self.y] == itembox:
-                room[self.x+1][self.y] = item
+                self.state.setTile(self.x+1,self.y,item)
 
 # DROPPER
 class Dropper:
@@ -475,47 +945,68 @@ class Dropper:
         cooldown (float): Initialises the cooldown for
         the dropper's movement.
         
-        gravCooldown (float): Initialises the cooldown for
-        the gravity of boxes dropped by the dropper.
-
         x (int): The horizontal position of the dropper.
 
         y (int): The vertical position of the dropper.
 
         dropperImage (pygame.Surface): Stores the Surface
         with the dropper image loaded.
+
+        state (GameState): The game state the dropper belongs to.
     """
 
-    def __init__(self):
-        """The constructor method for class Dropper."""
+    def __init__(self,state):
+        """
+        The constructor method for class Dropper.
+
+        Parameters:
+            state (GameState): The game state the dropper belongs to.
+        """
 
         self.cooldown     = 0.00
-        self.gravCooldown = 0.00
         self.x            = 1
         self.y            = 1
         self.dropperImage = d
-    
-    def decCooldown(self,n:float) -> None:
+        self.state        = state
+
+    def fork(self,state):
         """
-        A method that decrements cooldown by
-        a float value 'n'.
+        A method used to make a copy of the dropper
+        for a forked game state.
 
         Parameters:
-            n (float): A float value used to decrement cooldown.
+            state (GameState): The game state the copy belongs to.
+
+        Returns:
+            dropper (Dropper): The copied dropper.
         """
 
-        self.cooldown -= n
+        new = Dropper.__new__(Dropper)
+        new.cooldown     = self.cooldown
+        new.x            = self.x
+        new.y            = self.y
+        new.dropperImage = self.dropperImage
+        new.state        = state
+
+        return new
     
-    def decGravCooldown(self,n:float) -> None:
+    def startCooldown(self) -> None:
         """
-        A method that decrements gravCooldown by
-        a float value 'n'.
-
-        Parameters:
-            n (float): A float value used to decrement cooldown.
+        A method that starts the movement cooldown
+        and registers its end with the scheduler. A
+        delay of 0 or less ends the cooldown straight
+        away, without a timer.
         """
 
-        self.gravCooldown -= n
+        self.cooldown = DROPPERDELAY
+        if DROPPERDELAY > 0:
+            self.state.scheduler.afterSeconds(DROPPERDELAY,
+                                              lambda state: state.dropper.endCooldown())
+
+    def endCooldown(self) -> None:
+        """A method used to end the movement cooldown."""
+
+        self.cooldown = 0.00
 
     def setPosition(self,x,y) -> None:
         """
@@ -528,6 +1019,7 @@ class Dropper:
             y (int): Vertical position of the dropper.
         """
 
+        self.state.hash ^= dropperKeys[self.x][self.y] ^ dropperKeys[x][y]
         self.x = x
         self.y = y
     
@@ -557,15 +1049,17 @@ class Dropper:
         The dropper moves one tile towards the player.
         """
 
+        room = self.state.room
+
         if self.cooldown <= 0:
-            if (player.getX() < self.getX() 
+            if (self.state.player.getX() < self.getX() 
                     and room[self.x-1][self.y] == background):
-                self.x -= 1
-            elif (player.getX() > self.getX() 
+                self.setPosition(self.x-1,self.y)
+            elif (self.state.player.getX() > self.getX() 
                 and room[self.x+1][self.y] == background):
-                self.x += 1
+                self.setPosition(self.x+1,self.y)
 
-            self.cooldown = DROPPERDELAY
+            self.startCooldown()
 
     def activateDropper(self) -> None:
         """
@@ -574,8 +1068,8 @@ class Dropper:
         below the dropper.
         """
 
-        if self.x == player.getX():
-            room[self.x][self.y+1] = box
+        if self.x == self.state.player.getX():
+            self.state.setTile(self.x,self.y+1,box)
             
     
     def applyBoxGravity(self) -> None:
@@ -584,63 +1078,70 @@ class Dropper:
         dropped by the dropper.
         If a box is found, it is moved down by one tile.
         If the player is right below a box, they are crushed
-        and the program exits.
+        and the game state is marked as over.
         """
 
-        if self.gravCooldown <= 0:
-            for x in range(0,X//IMGSCALE):
-                for y in range(Y//IMGSCALE-1,0,-1):
-                    if ((room[x][y] == box or room[x][y] == itembox)
-                            and (x == player.getX() and y == player.getY()-1)):
-                        exit(0)
-                    
-                    # STOP BOXES FROM LANDING ON ITEMS TO PREVENT SOFTLOCK
-                    elif (room[x][y] == box 
-                          and (room[x][y+1] == item)):
-                        room[x][y] = background
+        room    = self.state.room
+        player  = self.state.player
+
+        # A BOX RIGHT ABOVE THE PLAYER CRUSHES THEM
+        if (player.getX() < X//IMGSCALE and player.getY()-1 >= 1
+                and (room[player.getX()][player.getY()-1] == box 
+                     or room[player.getX()][player.getY()-1] == itembox)):
+            self.state.gameOver = True
+            return
+
+        # ONLY THE TILES BETWEEN THE TOP OF A COLUMN AND ITS
+        # LOWEST FALLING BOX CAN CHANGE, BOTTOM UP SO THAT A
+        # STACK OF BOXES FALLS TOGETHER
+        for x,lowestY in self.state.surfaces.getFalling():
+            for y in range(lowestY,self.state.surfaces.getTop(x)-1,-1):
+                # STOP BOXES FROM LANDING ON ITEMS TO PREVENT SOFTLOCK
+                if (room[x][y] == box 
+                      and (room[x][y+1] == item)):
+                    self.state.setTile(x,y,background)
  
-                    elif (room[x][y] == box 
-                            and room[x][y+1] == background):
-                        room[x][y] = background
-                        room[x][y+1] = box
+                elif (room[x][y] == box 
+                        and room[x][y+1] == background):
+                    self.state.setTile(x,y,background)
+                    self.state.setTile(x,y+1,box)
 
-                    elif (room[x][y] == itembox 
-                          and room[x][y+1] == background):
-                        room[x][y] = background
-                        room[x][y+1] = itembox
+                elif (room[x][y] == itembox 
+                      and room[x][y+1] == background):
+                    self.state.setTile(x,y,background)
+                    self.state.setTile(x,y+1,itembox)
 
-def generateRoom(room:list,levelNumber:int) -> list:
+def generateRoom(state) -> None:
     """
     Function used to generate the level
-    for the game.
+    for the game. Every tile is placed with
+    setTile, so the hash and surface map of
+    the game state are updated as it goes.
 
     Parameters:
-        room (list): A 2D list representing the level.
-
-        levelNumber (int): An integer that represents the
-        number level the player is on.
-
-    Returns:
-        room (list): The filled version of the 2D list
-        representing the level.
+        state (GameState): The game state to generate
+        the level for, using its levelNumber.
     """
 
+    room        = state.room
+    levelNumber = state.levelNumber
+
     for x in range(X//IMGSCALE):
         for y in range(0,Y//IMGSCALE):
             if x == 33 and y == 16-levelNumber:
-                room[x][16-levelNumber] = door
+                state.setTile(x,16-levelNumber,door)
             elif x == 0:
-                room[x][y] = wall
+                state.setTile(x,y,wall)
             elif x == 33:
-                room[x][y] = wall
+                state.setTile(x,y,wall)
             elif y == 0:
-                room[x][y] = ceiling
+                state.setTile(x,y,ceiling)
             elif y == 16:
-                room[x][y] = floor
+                state.setTile(x,y,floor)
             else:
-                room[x][y] = background
+                state.setTile(x,y,background)
 
-    room[5][15] = itembox
+    state.setTile(5,15,itembox)
 
     # band aid solution to an issue where
     # past level 11 item box numbers stop
@@ -654,9 +1155,9 @@ def generateRoom(room:list,levelNumber:int) -> list:
             randY = random.randint(3,14)
             for j in range(1,4):
                 if randX+j < 30 and room[randX][randY+1] == background:
-                    room[randX+j][randY] = floor
+                    state.setTile(randX+j,randY,floor)
             if room[randX+1][randY] == floor:
-                room[randX+1][randY-1] = itembox
+                state.setTile(randX+1,randY-1,itembox)
 
     elif levelNumber >= 11:
         for i in range(0,levelNumber+2):
@@ -665,119 +1166,461 @@ def generateRoom(room:list,levelNumber:int) -> list:
             randY = random.randint(3,14)
             for j in range(1,4):
                 if randX+j < 30 and room[randX][randY+1] == background:
-                    room[randX+j][randY] = floor
+                    state.setTile(randX+j,randY,floor)
             if room[randX+1][randY] == floor:
-                room[randX+1][randY-1] = itembox
-           
-    return room
+                state.setTile(randX+1,randY-1,itembox)
 
-# HOLDS TILEMAP
-room:list = [[None for _ in range(Y//IMGSCALE)] 
-    for _ in range(X//IMGSCALE+1)]
 
-# INSTANTIATE PLAYER AND DROPPER
-player  = Player()
-dropper = Dropper()
+# SCHEDULER
+class Scheduler:
+    """
+    Class used to run actions once a cooldown ends or every
+    few turns or seconds. Timers are kept in heaps ordered by
+    when they are due, so each frame or turn only looks at the
+    timers that actually fire, however many are waiting.
 
-room = generateRoom(room,levelNumber)
+    Actions are functions that take the GameState, so that
+    a forked state runs its timers on itself.
 
-while running:
-    # POLL FOR EVENTS
-    for event in pygame.event.get():
-        # QUIT PROGRAM
-        if event.type == pygame.QUIT:
-            running   = False
+    Attributes:
+        time (float): The number of seconds passed so far.
 
-        # CHECK FOR KEYS BEING PRESSED 
-        if event.type == pygame.KEYDOWN:
-            # INCREMENT TURN NUMBER
-            turnNumber += 1
-            if player.getEnergy() < player.getMaxEnergy():
-                player.changeEnergy(10)
+        turn (int): The number of turns taken so far.
+
+        order (int): The number of timers registered so far. Timers
+        due at the same moment run in the order they were registered.
+
+        clockTimers (list): A heap of (due, order, period, action)
+        timers measured in seconds.
+
+        turnTimers (list): A heap of (due, order, period, action)
+        timers measured in turns.
+    """
+
+    def __init__(self):
+        """The constructor method for class Scheduler."""
+
+        self.time        = 0.00
+        self.turn        = 0
+        self.order       = 0
+        self.clockTimers = []
+        self.turnTimers  = []
+
+    def copy(self):
+        """
+        A method used to make a copy of the scheduler.
+        The timers themselves never change, so only the
+        heaps are copied.
+
+        Returns:
+            scheduler (Scheduler): The copied scheduler.
+        """
+
+        new = Scheduler.__new__(Scheduler)
+        new.time        = self.time
+        new.turn        = self.turn
+        new.order       = self.order
+        new.clockTimers = list(self.clockTimers)
+        new.turnTimers  = list(self.turnTimers)
+
+        return new
+
+    def addTimer(self,timers:list,due,period,action) -> None:
+        """
+        A method used to add a timer to one of the heaps.
+
+        Parameters:
+            timers (list): The heap to add the timer to.
+
+            due (float): When the timer fires.
+
+            period (float): How long until it fires again,
+            or 0 if it only fires once.
+
+            action (function): The function to run, which is
+            passed the GameState.
+        """
+
+        heapq.heappush(timers,(due,self.order,period,action))
+        self.order += 1
+
+    def afterSeconds(self,delay:float,action) -> None:
+        """
+        A method used to run an action once, after
+        a number of seconds.
+
+        Parameters:
+            delay (float): The number of seconds to wait.
+
+            action (function): The function to run, which is
+            passed the GameState.
+        """
+
+        self.addTimer(self.clockTimers,self.time+delay,0,action)
+
+    def afterTurns(self,turns:int,action) -> None:
+        """
+        A method used to run an action once, after
+        a number of turns.
+
+        Parameters:
+            turns (int): The number of turns to wait.
+
+            action (function): The function to run, which is
+            passed the GameState.
+        """
+
+        self.addTimer(self.turnTimers,self.turn+turns,0,action)
+
+    def everySeconds(self,period:float,action) -> None:
+        """
+        A method used to run an action every time
+        a number of seconds passes.
+
+        Parameters:
+            period (float): The number of seconds between runs.
+            Must be more than 0.
+
+            action (function): The function to run, which is
+            passed the GameState.
+        """
+
+        self.addTimer(self.clockTimers,self.time+period,period,action)
+
+    def everyTurns(self,period:int,action) -> None:
+        """
+        A method used to run an action every time
+        a number of turns passes.
+
+        Parameters:
+            period (int): The number of turns between runs.
+            Must be more than 0.
+
+            action (function): The function to run, which is
+            passed the GameState.
+        """
+
+        self.addTimer(self.turnTimers,self.turn+period,period,action)
+
+    def runTimers(self,timers:list,now,state) -> None:
+        """
+        A method used to run every timer in a heap that
+        is due, putting repeating timers back in the heap.
+
+        Parameters:
+            timers (list): The heap to run timers from.
+
+            now (float): The current time or turn.
+
+            state (GameState): The game state passed to the actions.
+        """
+
+        while timers and timers[0][0] <= now:
+            due,order,period,action = heapq.heappop(timers)
+            if period:
+                heapq.heappush(timers,(due+period,order,period,action))
+            action(state)
+
+    def advanceTime(self,state,n:float) -> None:
+        """
+        A method used to move the clock on by a float
+        value 'n' and run the timers that are now due.
+
+        Parameters:
+            state (GameState): The game state passed to the actions.
+
+            n (float): The number of seconds passed.
+        """
+
+        self.time += n
+        self.runTimers(self.clockTimers,self.time,state)
+
+    def advanceTurn(self,state) -> None:
+        """
+        A method used to move on by one turn and
+        run the timers that are now due.
+
+        Parameters:
+            state (GameState): The game state passed to the actions.
+        """
+
+        self.turn += 1
+        self.runTimers(self.turnTimers,self.turn,state)
+
+# GAME STATE
+class GameState:
+    """
+    Class used to hold everything that changes while the
+    game is played, so that it can be forked cheaply for
+    lookahead search. Forks share the columns of the tilemap
+    with the state they came from, and a column is only copied
+    the first time a fork writes to it.
+
+    Attributes:
+        room (list): A 2D list representing the level.
+
+        shared (list): For each column of room, whether it
+        may still be shared with another state.
+
+        surfaces (SurfaceMap): The surface height map for room.
+
+        tiles (BlitSequence): The tiles to draw each frame. Only
+        the state that is drawn has one, forks set this to None.
+
+        scheduler (Scheduler): Runs cooldown ends and the
+        dropper's actions.
+
+        player (Player): The player.
+
+        dropper (Dropper): The dropper.
+
+        turnNumber (int): The number of turns taken so far.
+
+        levelNumber (int): The level the player is on.
+
+        gameOver (bool): Whether the player has been crushed.
+
+        hash (int): The 64 bit Zobrist hash of the tilemap, the
+        player and dropper positions, the player's energy, points
+        and portal flags, and whether the turn number is odd. It
+        is updated whenever any of these change.
+    """
+
+    def __init__(self):
+        """The constructor method for class GameState."""
+
+        self.room        = [[None for _ in range(Y//IMGSCALE)] 
+                            for _ in range(X//IMGSCALE+1)]
+        self.shared      = [False for _ in range(X//IMGSCALE+1)]
+        self.surfaces    = SurfaceMap(X//IMGSCALE+1,Y//IMGSCALE)
+        self.surfaces.rebuild(self.room)
+        self.tiles       = BlitSequence(X//IMGSCALE,Y//IMGSCALE)
+        self.scheduler   = Scheduler()
+        self.player      = Player(self)
+        self.dropper     = Dropper(self)
+        self.turnNumber  = 0
+        self.levelNumber = STARTLEVEL
+        self.gameOver    = False
+        self.hash        = self.computeHash()
+
+        # DROPPER MOVES EVERY TWO TURNS
+        self.scheduler.everyTurns(2,lambda state: state.dropper.moveDropper())
+
+        # DROPPER ACTIVATES EVERY SEVEN TURNS
+        self.scheduler.everyTurns(7,lambda state: state.dropper.activateDropper())
+
+        self.loadLevel()
+
+    def fork(self):
+        """
+        A method used to make a copy of the game state that
+        can be played on without changing this one. Only the
+        outer lists of the tilemap and surface map are copied,
+        the columns are copied later if and when either state
+        writes to them.
+
+        Returns:
+            state (GameState): The forked game state.
+        """
+
+        new = GameState.__new__(GameState)
+        new.room        = list(self.room)
+        new.shared      = [True for _ in self.room]
+        self.shared     = [True for _ in self.room]
+        new.surfaces    = self.surfaces.copy()
+        new.tiles       = None
+        new.scheduler   = self.scheduler.copy()
+        new.player      = self.player.fork(new)
+        new.dropper     = self.dropper.fork(new)
+        new.turnNumber  = self.turnNumber
+        new.levelNumber = self.levelNumber
+        new.gameOver    = self.gameOver
+        new.hash        = self.hash
+
+        return new
+
+    def setTile(self,x:int,y:int,tile:pygame.Surface) -> None:
+        """
+        A method used to change a single tile of the level
+        while keeping the surface map and blit sequence up to date.
+
+        Parameters:
+            x (int): Horizontal position of the tile.
+
+            y (int): Vertical position of the tile.
+
+            tile (pygame.Surface): The tile to place.
+        """
+
+        if self.shared[x]:
+            self.room[x]   = list(self.room[x])
+            self.surfaces.copyColumn(x)
+            self.shared[x] = False
+
+        self.hash ^= tileKeys[self.room[x][y]][x][y] ^ tileKeys[tile][x][y]
+        self.room[x][y] = tile
+        self.surfaces.updateTile(self.room,x,y)
+
+        if self.tiles is not None:
+            self.tiles.updateTile(x,y,tile)
+
+    def loadLevel(self) -> None:
+        """
+        A method used to generate the room for the current
+        level. The hash and surface map are updated tile by
+        tile by generateRoom, only the blit sequence is rebuilt.
+        """
+
+        generateRoom(self)
+
+        if self.tiles is not None:
+            self.tiles.rebuild(self.room)
+
+    def computeHash(self) -> int:
+        """
+        A method used to work out the Zobrist hash from
+        scratch. The hash attribute is kept up to date without
+        this, it is used to set it up and to check it.
 
-            # HANDLE INPUT FOR KEY 'D'
-            if event.key == pygame.K_d:
-                player.moveRight()
+        Returns:
+            stateHash (int): The 64 bit Zobrist hash of the game state.
+        """
+
+        stateHash = 0
 
-            # HANDLE INPUT FOR KEY 'A'
-            elif event.key == pygame.K_a:
-                player.moveLeft()
+        for x in range(len(self.room)):
+            for y in range(len(self.room[x])):
+                stateHash ^= tileKeys[self.room[x][y]][x][y]
 
-            # HANDLE INPUT FOR KEY 'Q' 
-            elif event.key == pygame.K_q:
-                player.breakBox()
-                player.changeEnergy(-50)
+        stateHash ^= playerKeys[self.player.x][self.player.y]
+        stateHash ^= dropperKeys[self.dropper.x][self.dropper.y]
+        stateHash ^= zobristKey(ZOBRISTENERGY,self.player.currentEnergy)
+        stateHash ^= zobristKey(ZOBRISTPOINTS,self.player.points)
 
-            elif event.key == pygame.K_RIGHT:
-                player.makePortal(True)
+        if self.player.entryPortalExists:
+            stateHash ^= ENTRYPORTALKEY
+        if self.player.exitPortalExists:
+            stateHash ^= EXITPORTALKEY
+        if self.turnNumber % 2 == 1:
+            stateHash ^= TURNPARITYKEY
 
-            elif event.key == pygame.K_LEFT:
-                player.makePortal(False)
+        return stateHash
 
-            elif event.key == pygame.K_r:
-                player.clearPortals()
+    def takeTurn(self,key:int) -> None:
+        """
+        A method used to play one turn, in response to
+        a key being pressed.
+
+        Parameters:
+            key (int): The pygame key code of the key pressed.
+        """
+
+        player  = self.player
+        dropper = self.dropper
+
+        # INCREMENT TURN NUMBER
+        self.turnNumber += 1
+        self.hash ^= TURNPARITYKEY
+        if player.getEnergy() < player.getMaxEnergy():
+            player.changeEnergy(10)
+
+        # HANDLE INPUT FOR KEY 'D'
+        if key == pygame.K_d:
+            player.moveRight()
+
+        # HANDLE INPUT FOR KEY 'A'
+        elif key == pygame.K_a:
+            player.moveLeft()
+
+        # HANDLE INPUT FOR KEY 'Q' 
+        elif key == pygame.K_q:
+            player.breakBox()
+            player.changeEnergy(-50)
+
+        elif key == pygame.K_RIGHT:
+            player.makePortal(True)
+
+        elif key == pygame.K_LEFT:
+            player.makePortal(False)
+
+        elif key == pygame.K_r:
+            player.clearPortals()
+
+        # HANDLE GRAVITY FOR PLAYER AND BOXES
+        player.applyPlayerGravity()
+        dropper.applyBoxGravity()
+        
+        # RUN THE DROPPER'S ACTIONS FOR THIS TURN
+        self.scheduler.advanceTurn(self)
 
-            # HANDLE GRAVITY FOR PLAYER AND BOXES
-            player.applyPlayerGravity()
-            dropper.applyBoxGravity()
+    def checkDoor(self) -> None:
+        """
+        A method used to move on to the next level when
+        the player is on the door with enough points.
+        """
+
+        if (self.room[self.player.getX()][self.player.getY()] == door 
+            and self.player.getPoints() >= self.levelNumber):
+            # INCREMENT LEVEL NUMBER BY 1
+            self.levelNumber += 1
+
+            # RESET POINTS
+            self.player.resetPoints()
+
+            # GENERATE THE ROOM AGAIN
+            self.loadLevel()
             
-            # DROPPER MOVES EVERY TWO TURNS
-            if turnNumber % 2 == 0:
-                dropper.moveDropper()
+            # SET THE PLAYER TO THE START AGAIN
+            self.player.setPosition(1,(Y - (2*IMGSCALE))//IMGSCALE)
+
+# INSTANTIATE GAME STATE
+state = GameState()
+
+while running:
+    # POLL FOR EVENTS
+    for event in pygame.event.get():
+        # QUIT PROGRAM
+        if event.type == pygame.QUIT:
+            running   = False
+
+        # CHECK FOR KEYS BEING PRESSED 
+        if event.type == pygame.KEYDOWN:
+            state.takeTurn(event.key)
 
-            # DROPPER ACTIVATES EVERY SEVEN TURNS
-            if turnNumber % 7 == 0:
-                dropper.activateDropper()
+            # EXIT WHEN THE PLAYER IS CRUSHED
+            if state.gameOver:
+                exit(0)
 
     # DRAW LEVEL
-    for x in range(0,X//IMGSCALE):
-        for y in range(0,Y//IMGSCALE):
-            if room[x][y] != None:
-                screen.blit(room[x][y],
-                            (x*IMGSCALE,
-                             y*IMGSCALE))
+    screen.fblits(state.tiles.getSequence())
     
     # INCREASE LEVEL NUMBER WHEN PLAYER GETS TO NEXT LEVEL
-    if (room[player.getX()][player.getY()] == door 
-        and player.getPoints() >= levelNumber):
-        # INCREMENT LEVEL NUMBER BY 1
-        levelNumber += 1
+    state.checkDoor()
 
-        # RESET POINTS
-        player.resetPoints()
-
-        # GENERATE THE ROOM AGAIN
-        generateRoom(room,levelNumber)
-        
-        # SET THE PLAYER TO THE START AGAIN
-        player.setPosition(1,(Y - (2*IMGSCALE))//IMGSCALE)
-
-    if levelNumber == 16:
+    if state.levelNumber == 16:
         exit(0)
 
     # CALCULATE DECREMENT FOR COOLDOWNS
     delta:float = clock.tick()/1000
 
+    player  = state.player
+    dropper = state.dropper
+
     # DRAW PLAYER
-    screen.blit(player.playerImage,
-                (player.getX()*IMGSCALE,
-                 player.getY()*IMGSCALE))
+    screen.blit(scaled[player.playerImage],
+                (player.getX()*TILESIZE,
+                 player.getY()*TILESIZE))
 
     # DRAW PLAYER ENERGY BAR
     player.drawEnergyBar()
  
     # DRAW DROPPER
-    screen.blit(dropper.dropperImage,
-                (dropper.getX()*IMGSCALE,
-                 dropper.getY()*IMGSCALE))
-
-    # DECREASE MOVEMENT COOLDOWN
-    player.decCooldown(delta)
-    dropper.decCooldown(delta)
+    screen.blit(scaled[dropper.dropperImage],
+                (dropper.getX()*TILESIZE,
+                 dropper.getY()*TILESIZE))
 
-    # DECREASE GRAVITY COOLDOWN
-    player.decGravCooldown(delta)
-    dropper.decGravCooldown(delta)
+    # END COOLDOWNS THAT ARE DUE
+    state.scheduler.advanceTime(state,delta)
     
     # UPDATES DISPLAY
     pygame.display.flip()